@@ -10,6 +10,9 @@ load_dotenv()
 
 # Database
 DB_PATH = os.getenv("DB_PATH", "/data/users.db")
+# Open the DB as immutable (no locking or change detection). Only safe while
+# nothing writes to the file; set to 0 if it is updated in place.
+DB_IMMUTABLE = os.getenv("DB_IMMUTABLE", "1") == "1"
 
 # API
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -20,6 +23,16 @@ MAX_RESULTS = int(os.getenv("MAX_RESULTS", "25"))
 DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
 DB_RETRY_DELAY = float(os.getenv("DB_RETRY_DELAY", "0.5"))
 DEEP_SEARCH_DEPTH = int(os.getenv("DEEP_SEARCH_DEPTH", "3"))
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+# Comma-separated CPU ids to pin DB worker threads to (Linux only, empty = off)
+DB_CPU_AFFINITY = [int(c) for c in os.getenv("DB_CPU_AFFINITY", "").split(",") if c.strip()]
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "10000"))  # 0 disables
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "300"))
+# Walk links inside SQLite with a recursive CTE instead of the Python BFS.
+# Not a drop-in replacement: it also follows alt_mobile of rows the BFS skips
+# as duplicates (so it can return more records/phones) and orders rows by depth.
+DEEP_SEARCH_CTE = os.getenv("DEEP_SEARCH_CTE", "0") == "1"
 
 # CORS — comma-separated allowed origins
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
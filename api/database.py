@@ -5,17 +5,111 @@ Only uses indexed mobile column for all queries.
 """
 
 import asyncio
+import itertools
 import logging
+import os
 import sqlite3
-from functools import wraps
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from pathlib import Path
 from typing import Any
 
-import aiosqlite
-
-from api.config import DB_PATH, DB_RETRY_ATTEMPTS, DB_RETRY_DELAY, MAX_RESULTS, DEEP_SEARCH_DEPTH
+from api.config import (
+    DB_PATH, DB_RETRY_ATTEMPTS, DB_RETRY_DELAY, MAX_RESULTS, DEEP_SEARCH_DEPTH, DB_READERS,
+    DEEP_SEARCH_CTE, STATS_CACHE_TTL, DB_IMMUTABLE, LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL,
+    DB_CPU_AFFINITY,
+)
 
 logger = logging.getLogger(__name__)
 
+# Explicit column list — the profile only reads these, so don't pull the rest.
+# Rows stay plain tuples and are read by position via the COL_* indices.
+COLUMNS = ("mobile", "alt_mobile", "name", "fname", "email", "address", "circle")
+COL_MOBILE, COL_ALT, COL_NAME, COL_FNAME, COL_EMAIL, COL_ADDR, COL_CIRCLE = range(len(COLUMNS))
+USER_COLUMNS = ", ".join(COLUMNS)
+
+# Statements are kept as module constants so every call passes the identical
+# SQL string and hits sqlite3's per-connection prepared-statement cache.
+SQL_BY_MOBILE = f"SELECT {USER_COLUMNS} FROM users WHERE mobile = ? LIMIT ?"
+
+# Frontier numbers bound per batched lookup — well under SQLite's
+# host-parameter limit.
+MAX_BATCH = 500
+
+# The whole deep-link walk as one statement. Each hop follows the first
+# MAX_RESULTS rows of a number (same cap as search_by_mobile) to the last 10
+# chars of their alt_mobile, exactly like the Python BFS. Binds:
+# ?1 seed, ?2 max depth, ?3 rows per number.
+SQL_DEEP_LINKS = f"""
+WITH RECURSIVE links(num, depth) AS (
+    VALUES(?1, 0)
+    UNION
+    SELECT substr(trim(u.alt_mobile), -10), l.depth + 1
+    FROM links AS l
+    JOIN users AS u ON u.rowid IN (
+        SELECT rowid FROM users WHERE mobile = l.num LIMIT ?3
+    )
+    WHERE l.depth + 1 < ?2
+      AND length(trim(u.alt_mobile)) >= 10
+      AND substr(trim(u.alt_mobile), -10, 1) IN ('6', '7', '8', '9')
+)
+SELECT {", ".join(f"u.{c}" for c in COLUMNS)}
+FROM (SELECT num, MIN(depth) AS depth FROM links GROUP BY num HAVING MIN(depth) < ?2) AS l
+JOIN users AS u ON u.rowid IN (
+    SELECT rowid FROM users WHERE mobile = l.num LIMIT ?3
+)
+ORDER BY l.depth
+"""
+SQL_ROW_COUNT = "SELECT MAX(rowid) FROM users"
+# SQLite multiplies the two pragmas itself — one statement instead of two.
+SQL_DB_SIZE = "SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()"
+STATEMENT_CACHE_SIZE = 64
+
+# Placeholder values the dataset uses for "no data".
+_BAD = frozenset({"", "None", "N/A"})
+
+# Connections are opened read-only (mode=ro), so no journal or query_only
+# setup is needed.
+PRAGMAS = (
+    "PRAGMA cache_size=-64000;",
+    "PRAGMA temp_store=MEMORY;",
+)
+# Only relevant when locks can happen, i.e. not immutable.
+PRAGMAS_SHARED = ("PRAGMA busy_timeout=10000;",)
+
+
+@lru_cache(maxsize=None)
+def _sql_by_mobiles(count: int) -> str:
+    """
+    Batched lookup for `count` numbers, still capped at MAX_RESULTS rows each.
+    The correlated LIMIT stops each index scan early, like SQL_BY_MOBILE, so a
+    number with huge row counts costs no more than any other.
+    """
+    values = ",".join(["(?)"] * count)
+    return (
+        f"SELECT {', '.join(f'u.{c}' for c in COLUMNS)} "
+        f"FROM (VALUES {values}) AS v "
+        f"JOIN users AS u ON u.rowid IN ("
+        f"SELECT rowid FROM users WHERE mobile = v.column1 LIMIT ?)"
+    )
+
+
+def _row_key(row: tuple) -> int:
+    """Identity of a record for dedup across overlapping lookups."""
+    return hash((row[COL_MOBILE], row[COL_NAME], row[COL_FNAME], row[COL_ADDR]))
+
+
+def _pin_worker(cpus: list[int], slots) -> None:
+    """Executor initializer: pin this worker thread to the next CPU in `cpus`."""
+    cpu = cpus[next(slots) % len(cpus)]
+    try:
+        os.sched_setaffinity(0, {cpu})  # 0 = calling thread on Linux
+    except (OSError, ValueError) as e:  # ValueError: negative CPU id
+        logger.warning("Could not pin DB worker to CPU %d: %s", cpu, e)
+
 
 def retry_on_lock(func):
     """Retry on sqlite3.OperationalError (database locked)."""
@@ -25,9 +119,9 @@ def retry_on_lock(func):
         for attempt in range(1, DB_RETRY_ATTEMPTS + 1):
             try:
                 return await func(*args, **kwargs)
-            except (sqlite3.OperationalError, aiosqlite.OperationalError) as e:
+            except sqlite3.OperationalError as e:
                 if "locked" in str(e).lower() or "busy" in str(e).lower():
-                    logger.warning(f"DB locked (attempt {attempt}), retrying in {delay}s...")
+                    logger.warning("DB locked (attempt %d), retrying in %ss...", attempt, delay)
                     await asyncio.sleep(delay)
                     delay *= 2
                 else:
@@ -37,87 +131,198 @@ def retry_on_lock(func):
 
 
 class DatabaseManager:
-    """Async SQLite manager with deep-link search."""
+    """
+    Async facade over stdlib sqlite3 with deep-link search.
+
+    Queries run on a small thread pool, each worker holding its own
+    connection. A whole deep search is submitted as one job, so the event
+    loop pays a single thread hop per lookup instead of one per SQL query.
+    """
 
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
-        self._conn: aiosqlite.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+        self._conns: list[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._stats_cache: dict[str, tuple[float, int]] = {}
+        self._lookup_cache: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self.immutable = False
+        self.mmap_size = 0
+
+    def _open(self) -> sqlite3.Connection:
+        """Open one connection with optimized settings."""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            timeout=30,
+            check_same_thread=False,  # close() runs on the event loop thread
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in PRAGMAS if self.immutable else PRAGMAS + PRAGMAS_SHARED:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size};")
+        return conn
 
-    async def connect(self):
-        """Open connection with optimized settings."""
-        logger.info(f"Connecting to database: {self.db_path}")
-        self._conn = await aiosqlite.connect(self.db_path, timeout=30)
-        self._conn.row_factory = aiosqlite.Row
-
-        await self._conn.execute("PRAGMA journal_mode=WAL;")
-        await self._conn.execute("PRAGMA busy_timeout=10000;")
-        await self._conn.execute("PRAGMA cache_size=-64000;")
-        await self._conn.execute("PRAGMA mmap_size=2147483648;")
-        await self._conn.execute("PRAGMA temp_store=MEMORY;")
-        await self._conn.execute("PRAGMA query_only=ON;")
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling worker thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    async def _run(self, func, *args):
+        """Run a blocking DB function on the worker pool."""
+        if self._executor is None:
+            raise RuntimeError("Database not connected.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
 
-        logger.info("Database connected with WAL mode.")
+    async def connect(self):
+        """Start the worker pool and open the first connection."""
+        logger.info("Connecting to database: %s", self.db_path)
+
+        # immutable=1 skips all locking and change detection per query, but
+        # SQLite then ignores the WAL file — only use it when that is empty.
+        wal_path = f"{self.db_path}-wal"
+        self.immutable = DB_IMMUTABLE
+        if self.immutable and os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+            logger.warning("%s is not checkpointed; opening without immutable=1.", wal_path)
+            self.immutable = False
+
+        # Map the whole file so no page read falls back to pread(). SQLite
+        # clamps this to SQLITE_MAX_MMAP_SIZE; the effective value is read back.
+        self.mmap_size = os.path.getsize(self.db_path)
+
+        # Optionally pin each worker to its own core so its cache/TLB state for
+        # the mapped index pages stays warm.
+        pinning = {}
+        if DB_CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+            pinning = {"initializer": _pin_worker,
+                       "initargs": (DB_CPU_AFFINITY, itertools.count())}
+
+        # Read-only connections never block each other, so each worker can
+        # serve a different lookup concurrently.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, DB_READERS), thread_name_prefix="db", **pinning
+        )
+        # Open one connection eagerly so a bad DB_PATH fails at startup.
+        self.mmap_size = await self._run(
+            lambda: self.conn.execute("PRAGMA mmap_size").fetchone()[0]
+        )
+
+        mode = "immutable" if self.immutable else "read-only"
+        logger.info("Database connected %s (%d workers).", mode, max(1, DB_READERS))
 
     async def close(self):
-        if self._conn:
-            await self._conn.close()
-            self._conn = None
-
-    @property
-    def conn(self) -> aiosqlite.Connection:
-        if self._conn is None:
-            raise RuntimeError("Database not connected.")
-        return self._conn
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+        self._lookup_cache.clear()
+        self._stats_cache.clear()
+
+    def _search_by_mobile(self, mobile: str) -> list[tuple]:
+        return self.conn.execute(SQL_BY_MOBILE, (mobile, MAX_RESULTS)).fetchall()
+
+    def _search_by_mobiles(self, numbers: list[str]) -> dict[str, list[tuple]]:
+        """One indexed IN lookup per MAX_BATCH numbers, rows grouped by number."""
+        found: dict[str, list[tuple]] = {}
+        for i in range(0, len(numbers), MAX_BATCH):
+            chunk = numbers[i:i + MAX_BATCH]
+            sql = _sql_by_mobiles(len(chunk))
+            for row in self.conn.execute(sql, (*chunk, MAX_RESULTS)):
+                found.setdefault(str(row[COL_MOBILE]), []).append(row)
+        return found
 
     @retry_on_lock
     async def search_by_mobile(self, mobile: str) -> list[dict[str, Any]]:
         """Exact match on indexed mobile column — O(log n)."""
-        query = "SELECT * FROM users WHERE mobile = ? LIMIT ?"
-        async with self.conn.execute(query, (mobile, MAX_RESULTS)) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        rows = await self._run(self._search_by_mobile, mobile)
+        return [dict(zip(COLUMNS, row)) for row in rows]
 
     async def deep_search(self, seed_mobile: str) -> dict[str, Any]:
         """
         BFS deep-link: search mobile (indexed), extract alt_mobile,
         search alt values in mobile column. Up to DEEP_SEARCH_DEPTH levels.
+        Profiles are cached (LRU + TTL) since the data is read-only.
+        """
+        now = time.monotonic()
+        hit = self._lookup_cache.get(seed_mobile)
+        if hit and now - hit[0] < LOOKUP_CACHE_TTL:
+            self._lookup_cache.move_to_end(seed_mobile)
+            # Shallow copy: callers add top-level keys like response_time_ms.
+            return dict(hit[1])
+
+        profile = await self._deep_search(seed_mobile)
+
+        if LOOKUP_CACHE_SIZE > 0:
+            self._lookup_cache[seed_mobile] = (now, profile)
+            self._lookup_cache.move_to_end(seed_mobile)
+            while len(self._lookup_cache) > LOOKUP_CACHE_SIZE:
+                self._lookup_cache.popitem(last=False)
+        return dict(profile)
+
+    @retry_on_lock
+    async def _deep_search(self, seed_mobile: str) -> dict[str, Any]:
+        """Uncached deep search; the whole walk is one job on a DB worker."""
+        walk = self._sync_walk_cte if DEEP_SEARCH_CTE else self._sync_walk
+        return await self._run(walk, seed_mobile, DEEP_SEARCH_DEPTH)
+
+    @retry_on_lock
+    async def deep_search_cte(
+        self, seed_mobile: str, max_depth: int = DEEP_SEARCH_DEPTH
+    ) -> dict[str, Any]:
+        """
+        Deep-link walk as a single recursive CTE — one statement, with
+        SQLite following the links while its index pages are hot.
+        """
+        return await self._run(self._sync_walk_cte, seed_mobile, max_depth)
+
+    def _sync_walk(self, seed_mobile: str, max_depth: int) -> dict[str, Any]:
+        """
+        Python BFS over the mobile index, run on a worker thread. Each level
+        is fetched with one batched query, then walked in frontier order.
         """
-        visited: set[str] = set()
+        # Numbers are marked visited when enqueued, so each candidate costs a
+        # single set probe and a frontier never holds duplicates.
+        visited: set[str] = {seed_mobile}
         queue: list[str] = [seed_mobile]
-        all_rows: list[dict[str, Any]] = []
+        all_rows: list[tuple] = []
         seen_keys: set[int] = set()
 
         depth = 0
-        while queue and depth < DEEP_SEARCH_DEPTH:
+        while queue and depth < max_depth:
             next_queue: list[str] = []
 
+            found = self._search_by_mobiles(queue)
             for number in queue:
-                if number in visited:
-                    continue
-                visited.add(number)
-
-                rows = await self.search_by_mobile(number)
-
-                for row in rows:
-                    row_key = hash((
-                        row.get("mobile", ""),
-                        row.get("name", ""),
-                        row.get("fname", ""),
-                        row.get("address", ""),
-                    ))
+                for row in found.get(number, ()):
+                    row_key = _row_key(row)
                     if row_key in seen_keys:
                         continue
                     seen_keys.add(row_key)
                     all_rows.append(row)
 
-                    alt = str(row.get("alt_mobile", "")).strip()
-                    if alt and alt not in ("None", "N/A", ""):
+                    alt = str(row[COL_ALT]).strip()
+                    if alt not in _BAD:
                         alt_digits = alt[-10:] if len(alt) > 10 else alt
                         if (
                             len(alt_digits) == 10
                             and alt_digits[0] in "6789"
                             and alt_digits not in visited
                         ):
+                            visited.add(alt_digits)
                             next_queue.append(alt_digits)
 
             queue = next_queue
@@ -125,45 +330,68 @@ class DatabaseManager:
 
         return self._build_profile(seed_mobile, all_rows)
 
-    def _build_profile(self, seed: str, rows: list[dict[str, Any]]) -> dict[str, Any]:
-        """Consolidate rows into JSON profile."""
-        phones, addresses, names, fnames, emails, circles = [], [], [], [], [], []
-        seen_p, seen_a, seen_n, seen_fn, seen_e, seen_c = set(), set(), set(), set(), set(), set()
+    def _sync_walk_cte(self, seed_mobile: str, max_depth: int) -> dict[str, Any]:
+        """Recursive-CTE walk, run on a worker thread."""
+        rows = self.conn.execute(
+            SQL_DEEP_LINKS, (seed_mobile, max_depth, MAX_RESULTS)
+        ).fetchall()
 
+        all_rows: list[tuple] = []
+        seen_keys: set[int] = set()
         for row in rows:
-            mob = str(row.get("mobile", "")).strip()
-            alt = str(row.get("alt_mobile", "")).strip()
-            if mob and mob not in seen_p:
-                seen_p.add(mob)
-                phones.append(mob)
-            if alt and alt not in seen_p and alt not in ("None", "N/A"):
-                seen_p.add(alt)
-                phones.append(alt)
-
-            name = str(row.get("name", "")).strip()
-            if name and name not in seen_n and name != "None":
-                seen_n.add(name)
-                names.append(name)
-
-            fname = str(row.get("fname", "")).strip()
-            if fname and fname not in seen_fn and fname != "None":
-                seen_fn.add(fname)
-                fnames.append(fname)
-
-            email = str(row.get("email", "")).strip()
-            if email and email not in seen_e and email not in ("None", "N/A", ""):
-                seen_e.add(email)
-                emails.append(email)
-
-            addr = str(row.get("address", "")).strip()
-            if addr and addr not in seen_a and addr != "None":
-                seen_a.add(addr)
-                addresses.append(addr)
-
-            circle = str(row.get("circle", "")).strip()
-            if circle and circle not in seen_c and circle != "None":
-                seen_c.add(circle)
-                circles.append(circle)
+            row_key = _row_key(row)
+            if row_key in seen_keys:
+                continue
+            seen_keys.add(row_key)
+            all_rows.append(row)
+
+        return self._build_profile(seed_mobile, all_rows)
+
+    def _build_profile(self, seed: str, rows: list[tuple]) -> dict[str, Any]:
+        """Consolidate rows into JSON profile."""
+        # dicts double as insertion-ordered sets: one hash per value, no
+        # separate seen_* bookkeeping.
+        phones_d, names_d, fnames_d, emails_d, addrs_d, circles_d = {}, {}, {}, {}, {}, {}
+        bad = _BAD
+
+        # Unpacking in the loop target binds every column straight to a local
+        # (order must match COLUMNS), so the body is all fast-local access.
+        # Columns without TEXT affinity can hold INTEGER values, so non-str
+        # values go through str(); NULL is filtered before it becomes "None".
+        for mob, alt, name, fname, email, addr, circle in rows:
+            mob = str(mob).strip()
+            if mob not in bad:
+                phones_d[mob] = None
+            alt = str(alt).strip()
+            if alt not in bad:
+                phones_d[alt] = None
+
+            if name is not None:
+                name = (name if name.__class__ is str else str(name)).strip()
+                if name not in bad:
+                    names_d[name] = None
+
+            if fname is not None:
+                fname = (fname if fname.__class__ is str else str(fname)).strip()
+                if fname not in bad:
+                    fnames_d[fname] = None
+
+            if email is not None:
+                email = (email if email.__class__ is str else str(email)).strip()
+                if email not in bad:
+                    emails_d[email] = None
+
+            if addr is not None:
+                addr = (addr if addr.__class__ is str else str(addr)).strip()
+                if addr not in bad:
+                    addrs_d[addr] = None
+
+            if circle is not None:
+                circle = (circle if circle.__class__ is str else str(circle)).strip()
+                if circle not in bad:
+                    circles_d[circle] = None
+
+        phones = list(phones_d)
 
         return {
             "query": seed,
@@ -171,27 +399,37 @@ class DatabaseManager:
             "total_records": len(rows),
             "total_phones": len(phones),
             "phones": phones,
-            "names": names,
-            "father_names": fnames,
-            "emails": emails,
-            "addresses": addresses,
-            "regions": circles,
+            "names": list(names_d),
+            "father_names": list(fnames_d),
+            "emails": list(emails_d),
+            "addresses": list(addrs_d),
+            "regions": list(circles_d),
         }
 
+    async def _cached_stat(self, key: str, func) -> int:
+        """Serve a stats value from cache for STATS_CACHE_TTL seconds."""
+        now = time.monotonic()
+        hit = self._stats_cache.get(key)
+        if hit and now - hit[0] < STATS_CACHE_TTL:
+            return hit[1]
+        value = await self._run(func)
+        self._stats_cache[key] = (now, value)
+        return value
+
+    def _get_row_count(self) -> int:
+        row = self.conn.execute(SQL_ROW_COUNT).fetchone()
+        return row[0] if row and row[0] else 0
+
     @retry_on_lock
     async def get_row_count(self) -> int:
-        query = "SELECT MAX(rowid) FROM users"
-        async with self.conn.execute(query) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row and row[0] else 0
+        return await self._cached_stat("row_count", self._get_row_count)
+
+    def _get_db_size(self) -> int:
+        return self.conn.execute(SQL_DB_SIZE).fetchone()[0]
 
     @retry_on_lock
     async def get_db_size(self) -> int:
-        async with self.conn.execute("PRAGMA page_count") as c1:
-            page_count = (await c1.fetchone())[0]
-        async with self.conn.execute("PRAGMA page_size") as c2:
-            page_size = (await c2.fetchone())[0]
-        return page_count * page_size
+        return await self._cached_stat("db_size", self._get_db_size)
 
 
 db = DatabaseManager()
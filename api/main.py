@@ -5,20 +5,52 @@ Public REST API for mobile number lookup against 1.78B record database.
 
 import re
 import time
+import queue
+import atexit
 import logging
+import logging.handlers
 from contextlib import asynccontextmanager
+from functools import lru_cache
 
+import orjson
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from api.config import API_HOST, API_PORT, CORS_ORIGINS
 from api.database import db
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-8s | %(message)s",
+
+# ── Logging ────────────────────────────────────────────────────────
+class _SecondCachedFormatter(logging.Formatter):
+    """Formatter that runs strftime for %(asctime)s at most once per second."""
+
+    _cache: tuple[int, str] = (-1, "")
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        sec = int(record.created)
+        cached_sec, stamp = self._cache
+        if sec != cached_sec:
+            stamp = time.strftime(self.default_time_format, self.converter(sec))
+            self._cache = (sec, stamp)  # one tuple swap, safe across threads
+        return self.default_msec_format % (stamp, record.msecs)
+
+
+# Handlers only enqueue records; a listener thread does the actual writes,
+# so request handlers never block the event loop on console/file I/O.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(_SecondCachedFormatter("%(asctime)s | %(levelname)-8s | %(message)s"))
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))  # layout is applied by _log_handler
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _log_handler, respect_handler_level=True
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 
@@ -54,20 +86,72 @@ app.add_middleware(
 
 
 # ── Helpers ────────────────────────────────────────────────────────
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (C string escaping) instead of stdlib json."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+# Deletes every Latin-1 character except 0-9 in one C-level translate pass.
+_KEEP_DIGITS = str.maketrans(
+    "", "", "".join(chr(c) for c in range(256) if not 0x30 <= c <= 0x39)
+)
+_NON_DIGIT_RE = re.compile(r"\D")
+# Longer than any formatted number ("+91 (987) 654-3210" is 18) — rejected
+# before cleaning so junk never reaches the regex or the LRU cache.
+_MAX_INPUT_LEN = 40
+# Optional 091 / 91 / 0 prefix, then a 10-digit mobile starting 6-9.
+_MOBILE_RE = re.compile(r"(?:091|91|0)?([6-9]\d{9})")
+
+
+@lru_cache(maxsize=4096)  # repeat lookups of the same input are common
 def clean_mobile(raw: str) -> str | None:
     """Extract clean 10-digit Indian mobile from any format."""
-    digits = re.sub(r"[^\d]", "", raw)
-    if not digits:
-        return None
-    if len(digits) == 12 and digits.startswith("91"):
-        digits = digits[2:]
-    elif len(digits) == 11 and digits.startswith("0"):
-        digits = digits[1:]
-    elif len(digits) == 13 and digits.startswith("091"):
-        digits = digits[3:]
-    if len(digits) == 10 and digits[0] in "6789":
-        return digits
-    return None
+    s = raw.strip()
+    if s.isascii() and s.isdigit():
+        # Fast path: already bare digits, the common paste.
+        digits = s
+    elif s.startswith("+") and s[1:].isascii() and s[1:].isdigit():
+        # "+91XXXXXXXXXX": keep the 91 so the prefix rules below still apply.
+        digits = s[1:]
+    else:
+        digits = raw.translate(_KEEP_DIGITS)
+        if not (digits.isascii() and digits.isdigit()):
+            # Characters beyond Latin-1 survive the table; let the regex handle them.
+            digits = _NON_DIGIT_RE.sub("", raw)
+    m = _MOBILE_RE.fullmatch(digits)
+    return m.group(1) if m else None
+
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
+def format_size(num_bytes: int) -> str:
+    """Human-readable byte count, e.g. 1.5 GB."""
+    # Each unit is 10 more bits, so the unit index falls out of bit_length().
+    e = min((num_bytes.bit_length() - 1) // 10, 5) if num_bytes > 0 else 0
+    return f"{num_bytes / (1 << (e * 10)):.1f} {_SIZE_UNITS[e]}"
+
+
+# ── Static payloads ────────────────────────────────────────────────
+# Built once at import; these never change between requests.
+_ROOT_JSON = orjson.dumps({
+    "status": "online",
+    "name": "Phantom OSINT DB API",
+    "version": "1.0.0",
+    "records": "1.78B",
+    "endpoints": {
+        "lookup": "/api/lookup?number=9876543210",
+        "docs": "/docs",
+    },
+})
+
+_INVALID_NUMBER = {
+    "error": "Invalid number",
+    "message": "Please provide a valid 10-digit Indian mobile number.",
+    "example": "9876543210",
+}
 
 
 # ── Endpoints ──────────────────────────────────────────────────────
@@ -75,16 +159,7 @@ def clean_mobile(raw: str) -> str | None:
 @app.get("/")
 async def root():
     """API status."""
-    return {
-        "status": "online",
-        "name": "Phantom OSINT DB API",
-        "version": "1.0.0",
-        "records": "1.78B",
-        "endpoints": {
-            "lookup": "/api/lookup?number=9876543210",
-            "docs": "/docs",
-        },
-    }
+    return Response(content=_ROOT_JSON, media_type="application/json")
 
 
 @app.get("/api/lookup")
@@ -96,27 +171,23 @@ async def lookup(number: str = Query(..., description="10-digit Indian mobile nu
     - Performs deep-link search following alt_mobile chains
     - Returns consolidated profile with all linked data
     """
-    mobile = clean_mobile(number)
+    mobile = clean_mobile(number) if len(number) <= _MAX_INPUT_LEN else None
 
     if mobile is None:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "error": "Invalid number",
-                "message": "Please provide a valid 10-digit Indian mobile number.",
-                "example": "9876543210",
-            },
-        )
-
-    t_start = time.perf_counter()
+        raise HTTPException(status_code=400, detail=_INVALID_NUMBER)
+
+    t_start = time.perf_counter_ns()
     profile = await db.deep_search(mobile)
-    elapsed_ms = int((time.perf_counter() - t_start) * 1000)
+    elapsed_ms = (time.perf_counter_ns() - t_start) // 1_000_000
 
     profile["response_time_ms"] = elapsed_ms
 
-    logger.info(f"[LOOKUP] {mobile} → {profile['total_records']} records in {elapsed_ms}ms")
+    logger.info(
+        "[LOOKUP] %s → %d records in %dms", mobile, profile["total_records"], elapsed_ms
+    )
 
-    return JSONResponse(content=profile)
+    # Returned as a Response so FastAPI skips jsonable_encoder on the profile.
+    return ORJSONResponse(content=profile)
 
 
 @app.get("/api/stats")
@@ -125,22 +196,12 @@ async def stats():
     row_count = await db.get_row_count()
     db_size = await db.get_db_size()
 
-    units = ["B", "KB", "MB", "GB", "TB"]
-    size = float(db_size)
-    for unit in units:
-        if size < 1024:
-            size_str = f"{size:.1f} {unit}"
-            break
-        size /= 1024
-    else:
-        size_str = f"{size:.1f} PB"
-
     return {
         "total_records": row_count,
-        "database_size": size_str,
-        "engine": "SQLite WAL",
+        "database_size": format_size(db_size),
+        "engine": "SQLite (immutable)" if db.immutable else "SQLite (read-only)",
         "cache": "64MB",
-        "mmap": "2GB",
+        "mmap": format_size(db.mmap_size),
     }
 
 